@@ -0,0 +1,80 @@
+import functools
+
+import orjson
+import requests
+from iconsdk.icon_service import IconService
+from iconsdk.providers.http_provider import HTTPProvider
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+# Reuse one pool of keep-alive HTTP connections for every request in every tutorial,
+# and retry requests that fail to connect.
+SESSION = requests.Session()
+SESSION.headers["Connection"] = "keep-alive"
+HTTP_ADAPTER = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3),
+)
+SESSION.mount("https://", HTTP_ADAPTER)
+SESSION.mount("http://", HTTP_ADAPTER)
+
+
+class SessionHTTPProvider(HTTPProvider):
+    """
+    An HTTPProvider that sends requests through the shared session,
+    instead of opening a new connection for every request.
+    It also encodes requests with orjson, which is faster than the json module.
+    Responses are still decoded by HTTPProvider with the json module, because orjson
+    turns integers wider than 64 bits into floats, and SDK results can contain them.
+    """
+
+    @staticmethod
+    def _make_post_request(request_url: str, data: dict, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", 10)
+        return SESSION.post(url=request_url, data=orjson.dumps(data), **kwargs)
+
+
+def get_provider(
+    url: str = "https://ctz.solidwallet.io", version: int = 3
+) -> SessionHTTPProvider:
+    """
+    Returns the shared HTTPProvider for an ICON node.
+
+    Args:
+        url: The base URL of the ICON node.
+        version: The JSON-RPC API version.
+
+    Returns:
+        A SessionHTTPProvider. Every call with the same URL and version returns the same object.
+    """
+    # Pass the arguments positionally so that get_provider(url=...) and
+    # get_provider(...) hit the same cache entry.
+    return _get_provider(url, version)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_provider(url: str, version: int) -> SessionHTTPProvider:
+    return SessionHTTPProvider(url, version)
+
+
+def get_icon_service(
+    url: str = "https://ctz.solidwallet.io", version: int = 3
+) -> IconService:
+    """
+    Returns the shared IconService for an ICON node.
+
+    Args:
+        url: The base URL of the ICON node.
+        version: The JSON-RPC API version.
+
+    Returns:
+        An IconService. Every call with the same URL and version returns the same object.
+    """
+    # Like get_provider(), pass the arguments positionally to share one cache entry.
+    return _get_icon_service(url, version)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_icon_service(url: str, version: int) -> IconService:
+    return IconService(get_provider(url, version))
@@ -1,8 +1,29 @@
-from iconsdk.icon_service import IconService
-from iconsdk.providers.http_provider import HTTPProvider
+import os
 
-icon_service = IconService(HTTPProvider("https://ctz.solidwallet.io", 3))
+from dotenv import load_dotenv
 
+from icon_python_tutorials._client import get_icon_service
+
+# Load environment variables.
+load_dotenv()
+
+# Fetching a block is read-only and blockchain data is public,
+# so if your node accepts plain HTTP, set ICON_NODE_URL to its http:// URL
+# to skip the TLS handshake. Always use HTTPS when sending transactions.
+ICON_NODE_URL = os.getenv("ICON_NODE_URL", "https://ctz.solidwallet.io")
+
+# get_icon_service() creates an IconService(HTTPProvider(...)) once
+# and shares it between the tutorials, so they all reuse the same connections.
+icon_service = get_icon_service(ICON_NODE_URL)
+
+# get_block() returns the whole block, including every transaction in it.
+# On a busy block that can be hundreds of kilobytes to download and parse.
+# If you only need the block header, the node can return just that:
+#
+#   header = icon_service.get_block_header_by_height(height)
+#
+# The header comes back as base64-encoded bytes instead of JSON though,
+# so get_block() is easier to work with when you want to read the block.
 block = icon_service.get_block("latest")
 
 print(block)
@@ -1,26 +1,81 @@
+import asyncio
+import functools
 import os
-from random import randint
+from concurrent.futures import ThreadPoolExecutor
 
+import aiohttp
+import orjson
 from dotenv import load_dotenv
-from iconsdk.builder.call_builder import CallBuilder
-from iconsdk.builder.transaction_builder import CallTransactionBuilder
 from iconsdk.exception import JSONRPCException
-from iconsdk.icon_service import IconService
-from iconsdk.providers.http_provider import HTTPProvider
-from iconsdk.signed_transaction import SignedTransaction
-from iconsdk.wallet.wallet import KeyWallet
-from rich import print
+from iconsdk.utils.typing.conversion import object_to_str
+from rich import print as rprint
+
+from icon_python_tutorials._client import SESSION, get_provider
 
 # Load environment variables.
 load_dotenv()
 
-# Create IconService object and set network ID to 1 for mainnet.
-ICON_SERVICE = IconService(HTTPProvider("https://ctz.solidwallet.io", 3))
-NETWORK_ID = 1
+# Everything in this file is read-only and blockchain data is public,
+# so if your node accepts plain HTTP, set ICON_NODE_URL to its http:// URL
+# to skip the TLS handshake.
+ICON_NODE_URL = os.getenv("ICON_NODE_URL", "https://ctz.solidwallet.io")
+
+# Get the shared HTTPProvider object.
+# IconService would wrap this provider, but read-only calls here are sent to it directly.
+PROVIDER = get_provider(ICON_NODE_URL)
+
+# JSON-RPC endpoint for batch and asyncio requests, which don't go through PROVIDER.
+ICON_RPC_URL = f"{ICON_NODE_URL}/api/v3"
+
+# Balanced DEX contract address.
+BALANCED_DEX_CONTRACT = "cxa0af3165c08318e988cb30993b3048335b94af6c"
+
+# Fields in a "getPoolStats" result that hold hexadecimal strings.
+_POOL_HEX_FIELDS = (
+    "base",
+    "base_decimals",
+    "quote",
+    "quote_decimals",
+    "price",
+    "min_quote",
+    "total_supply",
+)
+
+# Number of pools to query in one batch request, or at the same time with asyncio.
+# ICON nodes limit how many calls a single batch request can contain.
+POOL_QUERY_WINDOW = 10
+
+# Number of batch requests to send at the same time when scanning Balanced pools.
+POOL_QUERY_WORKERS = 8
+
+
+def _icx_call_params(
+    to: str,
+    method: str,
+    params: dict = None,
+    height: int = None,
+) -> dict:
+    """
+    Builds the "icx_call" JSON-RPC parameters for a read-only request.
+    This is the same dictionary that CallBuilder and IconService.call() produce,
+    without building and validating a Call object first.
+
+    Args:
+        to: The contract address to query.
+        method: The contract method to query.
+        params: The parameters expected by the contract method.
+        height: The block height to query (useful for fetching data about past state).
 
-# Load ICX private key, and create a KeyWallet object wih the private key.
-ICX_PRIVATE_KEY = os.getenv("ICX_PRIVATE_KEY")
-WALLET = KeyWallet.load(bytes.fromhex(ICX_PRIVATE_KEY))
+    Returns:
+        A dictionary of "icx_call" parameters.
+    """
+    call_params = {"to": to, "dataType": "call", "data": {"method": method}}
+    if params:
+        # Integers are sent as hexadecimal strings.
+        call_params["data"]["params"] = object_to_str(params)
+    if height is not None:
+        call_params["height"] = hex(height)
+    return call_params
 
 
 def call(
@@ -41,123 +96,350 @@ def call(
     Returns:
         A dictionary containing the result of the query.
     """
-    call = CallBuilder(
-        to=to,
-        method=method,
-        params=params,
-        height=height,
-    ).build()
-    result = ICON_SERVICE.call(call)
+    result = PROVIDER.make_request(
+        "icx_call", _icx_call_params(to, method, params, height)
+    )
     return result
 
 
-def query_balanced_pool_data():
+def batch_call(calls: list) -> list:
+    """
+    Submits several read-only requests to the ICON blockchain in a single JSON-RPC batch request.
+
+    Args:
+        calls: A list of "icx_call" parameters made by _icx_call_params().
+
+    Returns:
+        A list with the result of each call, in the same order as @calls.
+        If a call failed, its item is a JSONRPCException instead of a result.
+    """
+    payload = [
+        {"jsonrpc": "2.0", "id": i, "method": "icx_call", "params": call_params}
+        for i, call_params in enumerate(calls)
+    ]
+    response = SESSION.post(
+        ICON_RPC_URL,
+        data=orjson.dumps(payload),
+        headers={"Content-Type": "application/json"},
+        timeout=10,
+    )
+    # orjson would turn integers wider than 64 bits into floats, but "icx_call" results
+    # encode numbers as hexadecimal strings, so it's safe to use here.
+    # Raise the same exception as HTTPProvider if the node (or a proxy in front of it)
+    # sends back something that isn't JSON, like an HTML error page.
+    try:
+        content = orjson.loads(response.content)
+    except orjson.JSONDecodeError:
+        raise JSONRPCException(
+            f"Unknown response: {response.content.decode(errors='replace')}"
+        )
+
+    # If the whole batch was rejected, the node returns a single error instead of a list.
+    if not isinstance(content, list):
+        if isinstance(content, dict) and "error" in content:
+            raise JSONRPCException(content["error"])
+        raise JSONRPCException(
+            f"Unknown response: {response.content.decode(errors='replace')}"
+        )
+
+    # Items in the response can come back in any order, so match them up by ID.
+    # Errors for requests the node couldn't read have a null ID, so they can't be matched.
+    items = {item.get("id"): item for item in content if isinstance(item, dict)}
+    unmatched_error = items.get(None, {}).get("error")
+    results = []
+    for i in range(len(calls)):
+        item = items.get(i)
+        if item is None:
+            results.append(
+                JSONRPCException(unmatched_error or f"No response for request ID {i}")
+            )
+        elif "error" in item:
+            results.append(JSONRPCException(item["error"]))
+        else:
+            results.append(item["result"])
+    return results
+
+
+async def call_async(
+    session: aiohttp.ClientSession,
+    to: str,
+    method: str,
+    params: dict = {},
+    height: int = None,
+) -> dict:
+    """
+    Submits a read-only request to query data from the ICON blockchain without blocking.
+
+    Args:
+        session: The aiohttp session used to send the request.
+        to: The contract address to query.
+        method: The contract method to query.
+        params: The parameters expected by the contract method.
+        height: The block height to query (useful for fetching data about past state).
+
+    Returns:
+        A dictionary containing the result of the query.
+    """
+    # This is the same "icx_call" request that call() sends.
+    payload = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "icx_call",
+        "params": _icx_call_params(to, method, params, height),
+    }
+
+    async with session.post(
+        ICON_RPC_URL,
+        data=orjson.dumps(payload),
+        headers={"Content-Type": "application/json"},
+    ) as response:
+        # Like batch_call(), this is safe because "icx_call" results use hexadecimal strings.
+        content = orjson.loads(await response.read())
+
+    # Raise the same exception as call() if the request failed.
+    if "error" in content:
+        raise JSONRPCException(content["error"])
+    return content["result"]
+
+
+def _parse_pool_stats(result: dict) -> dict:
+    """
+    Converts the hexadecimal strings in a "getPoolStats" result to integers.
+
+    Args:
+        result: The dictionary returned by the Balanced DEX contract's "getPoolStats" method.
+
+    Returns:
+        The same dictionary with hexadecimal strings converted to integers.
+    """
+    # @result is a dictionary that looks like this:
+    # {
+    #     "base": "0x24401c4c0b0eaf0bd3736",
+    #     "base_decimals": "0x12",
+    #     "base_token": "cx2609b924e33ef00b648a409245c7ea394c467824",
+    #     "min_quote": "0x8ac7230489e80000",
+    #     "name": "sICX/bnUSD",
+    #     "price": "0x2d49f768fb1b92d",
+    #     "quote": "0x764cd19f995e96ea3948",
+    #     "quote_decimals": "0x12",
+    #     "quote_token": "cx88fd7df7ddff82f7cc735c871dc519838cb235bb",
+    #     "total_supply": "0xdf8d79f78f8cd92da496",
+    # }
+
+    # Convert hexadecimal strings dictionary values to integers.
+    # Only the numeric fields are hexadecimal, so there's no need to check every value.
+    for k in _POOL_HEX_FIELDS:
+        result[k] = int(result[k], 16)
+
+    # After conversion, the dictionary looks like this:
+    # {
+    #     "base": 2739005184334618003584822,
+    #     "base_decimals": 18,
+    #     "base_token": "cx2609b924e33ef00b648a409245c7ea394c467824",
+    #     "min_quote": 10000000000000000000,
+    #     "name": "sICX/bnUSD",
+    #     "price": 203963214704261421,
+    #     "quote": 558656302488526822979912,
+    #     "quote_decimals": 18,
+    #     "quote_token": "cx88fd7df7ddff82f7cc735c871dc519838cb235bb",
+    #     "total_supply": 1055697505245356868084886,
+    # }
+
+    # The values are left as integers, because converting them to floats would lose precision.
+    # Use format_pool() to make them human-readable.
+    return result
+
+
+def _pool_ids(nonce: str) -> range:
+    """
+    Lists the IDs of every pool on the Balanced DEX.
+
+    Args:
+        nonce: The result of the Balanced DEX contract's "getNonce" method.
+
+    Returns:
+        A range of pool IDs.
+    """
+    # "getNonce" returns the ID that the next new pool will get.
+    # Pool IDs start at 1, so the existing pools are 1 through nonce - 1.
+    return range(1, int(nonce, 16))
+
+
+def _query_pool_batch(pool_ids: range) -> list:
+    """
+    Queries a range of pool IDs on the Balanced DEX in a single batch request.
+
+    Args:
+        pool_ids: The pool IDs to query.
+
+    Returns:
+        A list of pools.
+    """
+    # Build a "getPoolStats" call for every pool ID, and send them all in one request.
+    results = batch_call(
+        [
+            _icx_call_params(BALANCED_DEX_CONTRACT, "getPoolStats", {"_id": i})
+            for i in pool_ids
+        ]
+    )
+
+    pools = []
+    for result in results:
+        # Every pool ID came from "getNonce", so an error here is a real problem.
+        if isinstance(result, JSONRPCException):
+            raise result
+        pools.append(_parse_pool_stats(result))
+    return pools
+
+
+def format_units(value: int, decimals: int) -> str:
+    """
+    Formats an integer amount as a decimal string without losing precision.
+
+    Args:
+        value: The amount in its smallest unit (e.g. loop for ICX).
+        decimals: The number of decimal places the token uses.
+            This can be negative for a price between tokens with very different decimals,
+            in which case the value is scaled up instead.
+
+    Returns:
+        A decimal string, e.g. format_units(1500000000000000000, 18) returns "1.500000000000000000".
+    """
+    if decimals <= 0:
+        return str(value * 10**-decimals)
+    # Split the digits of the absolute value, so negative values aren't rounded down.
+    sign = "-" if value < 0 else ""
+    whole, fraction = divmod(abs(value), 10**decimals)
+    return f"{sign}{whole}.{fraction:0{decimals}d}"
+
+
+def format_pool(pool: dict) -> dict:
+    """
+    Makes the data for a pool human-readable.
+
+    Args:
+        pool: A pool returned by _parse_pool_stats().
+
+    Returns:
+        A copy of the pool with amounts formatted as decimal strings.
+    """
+    # Set base and quote decimals to their own variable
+    # because they'll be reused later on.
+    base_decimals = pool["base_decimals"]
+    quote_decimals = pool["quote_decimals"]
+
+    # Precision is used for price calculation.
+    precision = int((quote_decimals - base_decimals) + 18)
+
+    # To make things human-readable, format the values
+    # with the provided decimal counts.
+    formatted = dict(pool)
+    formatted["base"] = format_units(pool["base"], base_decimals)
+    formatted["quote"] = format_units(pool["quote"], quote_decimals)
+    formatted["price"] = format_units(pool["price"], precision)
+    formatted["min_quote"] = format_units(pool["min_quote"], quote_decimals)
+    formatted["total_supply"] = format_units(pool["total_supply"], quote_decimals)
+
+    # After accounting for decimal places, the formatted pool looks like this:
+    # {
+    #    "base": "2739005.184334618003584822",
+    #    "base_decimals": 18,
+    #    "base_token": "cx2609b924e33ef00b648a409245c7ea394c467824",
+    #    "min_quote": "10.000000000000000000",
+    #    "name": "sICX/bnUSD",
+    #    "price": "0.203963214704261421",
+    #    "quote": "558656.302488526822979912",
+    #    "quote_decimals": 18,
+    #    "quote_token": "cx88fd7df7ddff82f7cc735c871dc519838cb235bb",
+    #    "total_supply": "1055697.505245356868084886",
+    # }
+    return formatted
+
+
+def query_balanced_pool_data(verbose: bool = False):
     """
     Query the Balanced DEX for data on liquidity pools.
+
+    Args:
+        verbose: Pretty-print the data for every pool when finished.
     """
     # Initialize an array to hold pool data.
     pools = []
 
-    # Set initial pool ID to 1.
-    pool_id = 1
-
-    # Start a loop to make smart contract calls.
-    while True:
-        try:
-            # Query Balanced DEX contract's "getPoolStats" method with the provided pool ID.
-            result = call(
-                "cxa0af3165c08318e988cb30993b3048335b94af6c",  # cxa0af3165c08318e988cb30993b3048335b94af6c is the Balanced DEX contract address.
-                "getPoolStats",
-                {"_id": pool_id},
-            )
+    # Ask the Balanced DEX which pool IDs exist, instead of querying until one fails.
+    pool_ids = _pool_ids(call(BALANCED_DEX_CONTRACT, "getNonce"))
+
+    # Split the pool IDs into batches (1-10, 11-20, ...).
+    batches = [
+        pool_ids[start : start + POOL_QUERY_WINDOW]
+        for start in range(0, len(pool_ids), POOL_QUERY_WINDOW)
+    ]
+
+    # Send several batches at the same time from a pool of threads.
+    # executor.map() returns the results in the same order as the batches.
+    with ThreadPoolExecutor(max_workers=POOL_QUERY_WORKERS) as executor:
+        results = executor.map(_query_pool_batch, batches)
+        for batch_ids, batch in zip(batches, results):
+            for pool_id, pool in zip(batch_ids, batch):
+                pools.append(pool)
+                print(f"Added Pool #{pool_id}...")
 
-            # @result is a dictionary that looks like this:
-            # {
-            #     "base": "0x24401c4c0b0eaf0bd3736",
-            #     "base_decimals": "0x12",
-            #     "base_token": "cx2609b924e33ef00b648a409245c7ea394c467824",
-            #     "min_quote": "0x8ac7230489e80000",
-            #     "name": "sICX/bnUSD",
-            #     "price": "0x2d49f768fb1b92d",
-            #     "quote": "0x764cd19f995e96ea3948",
-            #     "quote_decimals": "0x12",
-            #     "quote_token": "cx88fd7df7ddff82f7cc735c871dc519838cb235bb",
-            #     "total_supply": "0xdf8d79f78f8cd92da496",
-            # }
-
-            # Convert hexadecimal strings dictionary values to integers.
-            for k, v in result.items():
-                try:
-                    if v.startswith("0x"):
-                        result[k] = int(v, 16)
-                except AttributeError:
-                    pass
-
-            # After conversion, the dictionary looks like this:
-            # {
-            #     "base": 2739005184334618003584822,
-            #     "base_decimals": 18,
-            #     "base_token": "cx2609b924e33ef00b648a409245c7ea394c467824",
-            #     "min_quote": 10000000000000000000,
-            #     "name": "sICX/bnUSD",
-            #     "price": 203963214704261421,
-            #     "quote": 558656302488526822979912,
-            #     "quote_decimals": 18,
-            #     "quote_token": "cx88fd7df7ddff82f7cc735c871dc519838cb235bb",
-            #     "total_supply": 1055697505245356868084886,
-            # }
-
-            # Set base and quote decimals to their own variable
-            # because they'll be reused later on.
-            base_decimals = result["base_decimals"]
-            quote_decimals = result["quote_decimals"]
-
-            # Precision is used for price calculation.
-            precision = int((quote_decimals - base_decimals) + 18)
-
-            # To make things human-readable, do some division
-            # with the provided decimal counts.
-            result["base"] = result["base"] / 10**base_decimals
-            result["quote"] = result["quote"] / 10**quote_decimals
-            result["price"] = result["price"] / 10**precision
-            result["min_quote"] = result["min_quote"] / 10**quote_decimals
-            result["total_supply"] = result["total_supply"] / 10**quote_decimals
-
-            # After accounting for decimal places, result looks like this:
-            # {
-            #    "base": 2739005.184334618,
-            #    "base_decimals": 18,
-            #    "base_token": "cx2609b924e33ef00b648a409245c7ea394c467824",
-            #    "min_quote": 10.0,
-            #    "name": "sICX/bnUSD",
-            #    "price": 0.20396321470426143,
-            #    "quote": 558656.3024885268,
-            #    "quote_decimals": 18,
-            #    "quote_token": "cx88fd7df7ddff82f7cc735c871dc519838cb235bb",
-            #    "total_supply": 1055697.5052453568,
-            # }
-
-            # Append pool to pools array.
-            pools.append(result)
-            print(f"Added Pool #{pool_id}...")
-            # Increment pool_id by 1 for the next iteration.
-            pool_id += 1
-
-        # For the purposes of this tutorial, JSONRPCException is raised if the pool ID doesn't exist.
-        # For production use cases, it's good to be more granular with error handling
-        # because JSONRPCException can also be raised in other situations.
-        # In that case, let's break out of the loop and finish up the function.
-        except JSONRPCException:
-            break
-
-    print(pools)
+    # Pretty-printing with rich is slow for a long list of pools, so only do it when asked.
+    if verbose:
+        rprint([format_pool(pool) for pool in pools])
     print(f"Fetched data for {len(pools)} pools on Balanced!")
     return pools
 
 
-def query_icx_usd_quote(height: int = None):
+async def query_balanced_pool_data_async(verbose: bool = False):
     """
-    Query the Band oracle contract for the latest ICX/USD quote.
+    Query the Balanced DEX for data on liquidity pools, fetching several pools at a time.
+
+    Args:
+        verbose: Pretty-print the data for every pool when finished.
+    """
+    # Initialize an array to hold pool data.
+    pools = []
+
+    # Share one connection pool between all requests.
+    # Give up on a request after 10 seconds, like call() and batch_call(),
+    # instead of letting one stalled pool hold up the whole scan.
+    connector = aiohttp.TCPConnector(limit=POOL_QUERY_WINDOW)
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        # Ask the Balanced DEX which pool IDs exist, instead of querying until one fails.
+        nonce = await call_async(session, BALANCED_DEX_CONTRACT, "getNonce")
+        pool_ids = _pool_ids(nonce)
+
+        # Send every "getPoolStats" request at once, and wait for all of them.
+        # The connector only lets POOL_QUERY_WINDOW of them run at the same time.
+        results = await asyncio.gather(
+            *[
+                call_async(session, BALANCED_DEX_CONTRACT, "getPoolStats", {"_id": i})
+                for i in pool_ids
+            ]
+        )
+
+    for pool_id, result in zip(pool_ids, results):
+        pools.append(_parse_pool_stats(result))
+        print(f"Added Pool #{pool_id}...")
+
+    # Pretty-printing with rich is slow for a long list of pools, so only do it when asked.
+    if verbose:
+        rprint([format_pool(pool) for pool in pools])
+    print(f"Fetched data for {len(pools)} pools on Balanced!")
+    return pools
+
+
+def _get_icx_usd_price(height: int = None) -> float:
+    """
+    Fetches the ICX/USD price from the Band oracle contract.
+
+    Args:
+        height: The block height to query, or None for the latest price.
+
+    Returns:
+        The ICX/USD price.
     """
     # Query Band oracle contract's "get_ref_data".
     result = call(
@@ -169,21 +451,57 @@ def query_icx_usd_quote(height: int = None):
     icx_usd_price = (
         int(result["rate"], 16) / 1_000_000_000
     )  # Divide by 1,000,000,000 to make it easier to read.
+    return icx_usd_price
+
+
+# The price at a past block height can never change, so it's safe to cache.
+# The latest price does change, so it always goes through _get_icx_usd_price().
+_get_historical_icx_usd_price = functools.lru_cache(maxsize=4096)(_get_icx_usd_price)
+
 
+def _print_icx_usd_quote(icx_usd_price: float, height: int = None):
+    """
+    Prints an ICX/USD quote.
+
+    Args:
+        icx_usd_price: The ICX/USD price.
+        height: The block height the price was queried at, or None for the latest price.
+    """
     if height is None:
         print(f"Current ICX/USD price is ${icx_usd_price}.")
     else:
         print(f"ICX/USD price at block #{height} was ${icx_usd_price}.")
+
+
+def query_icx_usd_quote(height: int = None):
+    """
+    Query the Band oracle contract for the latest ICX/USD quote.
+    """
+    if height is None:
+        icx_usd_price = _get_icx_usd_price()
+    else:
+        icx_usd_price = _get_historical_icx_usd_price(height)
+
+    _print_icx_usd_quote(icx_usd_price, height)
     return icx_usd_price
 
 
 def main():
     # Make a smart contract call to the Balanced DEX to query for pool data.
     # query_balanced_pool_data()
+    # The same query can also be made concurrently with asyncio.
+    # asyncio.run(query_balanced_pool_data_async())
 
     # Make a smart contract call to the Band oracle to query for the ICX/USD price.
-    query_icx_usd_quote()  # Latest quote.
-    query_icx_usd_quote(height=58_586_000)  # Quote at Block #58,586,000
+    # The two queries don't depend on each other, so send them at the same time.
+    # The threads only fetch prices; printing happens here so the lines can't get mixed up.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Latest quote.
+        latest = executor.submit(_get_icx_usd_price)
+        # Quote at Block #58,586,000
+        historical = executor.submit(_get_historical_icx_usd_price, 58_586_000)
+    _print_icx_usd_quote(latest.result())
+    _print_icx_usd_quote(historical.result(), height=58_586_000)
 
     # Make a smart contract call to stake ICX and delegate it to the RHIZOME validator node.
     return
@@ -1,24 +1,27 @@
 import os
-from random import randint
+from random import randrange
 
 from dotenv import load_dotenv
 from iconsdk.builder.transaction_builder import TransactionBuilder
-from iconsdk.icon_service import IconService
-from iconsdk.providers.http_provider import HTTPProvider
 from iconsdk.signed_transaction import SignedTransaction
 from iconsdk.wallet.wallet import KeyWallet
 
+from icon_python_tutorials._client import get_icon_service
+
 # Load environment variables.
 load_dotenv()
 
-# Create IconService object and set network ID to 1 for mainnet.
-ICON_SERVICE = IconService(HTTPProvider("https://ctz.solidwallet.io", 3))
+# Get the shared IconService object and set network ID to 1 for mainnet.
+ICON_SERVICE = get_icon_service("https://ctz.solidwallet.io")
 NETWORK_ID = 1
 
 # Load ICX private key, and create a KeyWallet object wih the private key.
 ICX_PRIVATE_KEY = os.getenv("ICX_PRIVATE_KEY")
 WALLET = KeyWallet.load(bytes.fromhex(ICX_PRIVATE_KEY))
 
+# The wallet address never changes, so derive it from the public key once.
+WALLET_ADDRESS = WALLET.get_address()
+
 
 def send_transaction(to: str, value: int) -> str:
     """
@@ -34,7 +37,7 @@ def send_transaction(to: str, value: int) -> str:
     # Build a transaction object.
     transaction = (
         TransactionBuilder()
-        .from_(WALLET.get_address())
+        .from_(WALLET_ADDRESS)
         .to(to)
         .value(value)  # Value is in loop, so
         .nid(NETWORK_ID)
@@ -52,7 +55,7 @@ def _generate_nonce() -> int:
     """
     Generates a four digit random number.
     """
-    nonce = int("".join([str(randint(0, 9)) for i in range(4)]))
+    nonce = randrange(1000, 10000)
     return nonce
 
 